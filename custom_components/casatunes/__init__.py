@@ -1,30 +1,54 @@
 """The CasaTunes integration."""
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Awaitable, Callable
 from datetime import timedelta
 import logging
 
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
 from aiohttp.client_exceptions import ClientResponseError
+from aiohttp.hdrs import USER_AGENT
 from pycasatunes import CasaTunes
 from pycasatunes.exceptions import CasaException
-from pycasatunes.objects.system import CasaTunesSystem
-from pycasatunes.objects.zone import CasaTunesZone
 import async_timeout
 import voluptuous as vol
 
 from homeassistant.components.media_player import DOMAIN as MEDIA_PLAYER_DOMAIN
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.const import CONF_HOST
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.const import CONF_HOST, EVENT_HOMEASSISTANT_CLOSE
 from homeassistant.helpers import config_validation as cv
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
     DataUpdateCoordinator,
     UpdateFailed,
 )
-from .const import DOMAIN
+from .const import (
+    COMMAND_CONCURRENCY,
+    CONF_MAX_CONNECTIONS,
+    CONNECT_TIMEOUT,
+    DEFAULT_MAX_CONNECTIONS,
+    DNS_CACHE_TTL,
+    DOMAIN,
+    KEEPALIVE_TIMEOUT,
+    REQUEST_TIMEOUT,
+)
+from .events import snapshot_changes
+from .play_queue import CasaTunesPlayQueue
+from .presets import CasaTunesPresets
+from .search import CasaTunesSearch
+from .services import async_setup_services
+from .snapshot import (
+    CasaTunesSnapshot,
+    NowPlayingRecord,
+    SystemRecord,
+    ZoneRecord,
+    build_snapshot,
+)
+from .websocket import async_setup_websocket
 
 CONFIG_SCHEMA = vol.Schema(
     {
@@ -42,19 +66,60 @@ _LOGGER = logging.getLogger(__name__)
 SCAN_INTERVAL = timedelta(seconds=15)
 
 
+@callback
+def async_create_session(max_connections: int = DEFAULT_MAX_CONNECTIONS) -> ClientSession:
+    """Create a dedicated HTTP session for a CasaTunes server.
+
+    Connections are kept alive for longer than SCAN_INTERVAL so polls reuse
+    them, and timeouts are short since the server is on the local network.
+    """
+    connector = TCPConnector(
+        limit=max_connections,
+        limit_per_host=max_connections,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TTL,
+    )
+    return ClientSession(
+        connector=connector,
+        timeout=ClientTimeout(total=REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        headers={USER_AGENT: SERVER_SOFTWARE},
+    )
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up CasaTunes from a config entry."""
 
-    client = CasaTunes(async_get_clientsession(hass), entry.data[CONF_HOST])
-    coordinator = CasaTunesDataUpdateCoordinator(hass, client=client)
+    session = async_create_session(
+        entry.options.get(CONF_MAX_CONNECTIONS, DEFAULT_MAX_CONNECTIONS)
+    )
+
+    async def _async_close_session(event: Event) -> None:
+        """Close the session when Home Assistant stops."""
+        await session.close()
+
+    entry.async_on_unload(
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_session)
+    )
+
+    client = CasaTunes(session, entry.data[CONF_HOST])
+    coordinator = CasaTunesDataUpdateCoordinator(hass, client=client, session=session)
+    coordinator.presets = CasaTunesPresets(hass, entry.entry_id)
+    await coordinator.presets.async_load()
 
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = coordinator
 
     # Fetch initial data so we have data when entities subscribe
-    await coordinator.async_config_entry_first_refresh()
+    try:
+        await coordinator.async_config_entry_first_refresh()
+    except Exception:
+        hass.data[DOMAIN].pop(entry.entry_id)
+        await session.close()
+        raise
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    async_setup_services(hass)
+    async_setup_websocket(hass)
     entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
     return True
@@ -64,35 +129,129 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await coordinator.session.close()
 
     return unload_ok
 
 
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload config entry."""
-    await async_unload_entry(hass, entry)
-    await async_setup_entry(hass, entry)
+    await hass.config_entries.async_reload(entry.entry_id)
 
 
-class CasaTunesDataUpdateCoordinator(DataUpdateCoordinator[CasaTunes]):
+class CasaTunesDataUpdateCoordinator(DataUpdateCoordinator[CasaTunesSnapshot]):
     """Class to manage fetching data from the API."""
 
-    def __init__(self, hass: HomeAssistant, client: CasaTunes) -> None:
+    def __init__(
+        self, hass: HomeAssistant, client: CasaTunes, session: ClientSession
+    ) -> None:
         """Initialize."""
         self.casatunes = client
+        self.session = session
+        self.search = CasaTunesSearch(session, client.host)
+        self.play_queue = CasaTunesPlayQueue(session, client.host)
+        self.announce_lock = asyncio.Lock()
+        self.announcing: dict[str, list] = {}
+        self._event_snapshot: CasaTunesSnapshot | None = None
 
         super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=SCAN_INTERVAL)
         self.entities: list[CasaTunesDeviceEntity] = []
 
-    async def _async_update_data(self) -> CasaTunes:
-        """Update data via library."""
+    async def _async_update_data(self) -> CasaTunesSnapshot:
+        """Update data via library.
+
+        Publishes an immutable snapshot of the fetch, sharing the records
+        that didn't change with the previous snapshot.
+        """
         try:
             await self.casatunes.fetch()
         except CasaException as exception:
             raise UpdateFailed() from exception
 
-        return self.casatunes
+        return build_snapshot(self.casatunes, self.data)
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update all registered listeners, then fire change events.
+
+        Events are fired after the entities wrote their new state, so
+        automations triggered by them see the current state.
+        """
+        super().async_update_listeners()
+
+        previous, self._event_snapshot = self._event_snapshot, self.data
+        if previous is None or self.data is None or previous is self.data:
+            return
+
+        entity_ids = {entity.zone_id: entity.entity_id for entity in self.entities}
+        for event_type, event_data in snapshot_changes(
+            previous, self.data, entity_ids
+        ):
+            self.hass.bus.async_fire(event_type, event_data)
+
+    async def async_run_zone_commands(
+        self,
+        commands: dict[str, Callable[[], Awaitable[None]]],
+        refresh: bool = True,
+    ) -> dict[str, str | None]:
+        """Run per-zone commands concurrently, then refresh once.
+
+        Each zone's command runs its own calls in order, while zones run in
+        parallel bounded by COMMAND_CONCURRENCY and the connection limit of
+        the session. Returns the error for each zone, or None if its command
+        succeeded.
+        """
+        limit = self.session.connector.limit or COMMAND_CONCURRENCY
+        semaphore = asyncio.Semaphore(min(COMMAND_CONCURRENCY, limit))
+
+        async def run(zone_id: str, command: Callable[[], Awaitable[None]]):
+            async with semaphore:
+                try:
+                    await command()
+                except (
+                    CasaException,
+                    ClientError,
+                    asyncio.TimeoutError,
+                    ValueError,
+                ) as err:
+                    # ValueError covers responses that aren't valid JSON.
+                    _LOGGER.debug("Command for zone %s failed: %s", zone_id, err)
+                    return str(err) or type(err).__name__
+            return None
+
+        errors = await asyncio.gather(
+            *(run(zone_id, command) for zone_id, command in commands.items())
+        )
+        if refresh:
+            await self.async_refresh()
+
+        return dict(zip(commands, errors))
+
+    async def async_sync_masters(self) -> None:
+        """Remove the master flag from zones that have no clients left."""
+        zones = self.data.zones
+        stale = [
+            zone.ZoneID
+            for zone in zones
+            if zone.MasterMode
+            and (
+                not zone.SharedRoomID
+                or not any(
+                    other.SharedRoomID == zone.SharedRoomID and not other.MasterMode
+                    for other in zones
+                    if other.SharedRoomID
+                )
+            )
+        ]
+        if not stale:
+            return
+
+        await asyncio.gather(
+            *(self.casatunes.zone_master(zone_id, False) for zone_id in stale)
+        )
+        await self.async_refresh()
+        _LOGGER.debug("%s zones are no longer master.", stale)
 
 
 class CasaTunesEntity(CoordinatorEntity):
@@ -101,7 +260,7 @@ class CasaTunesEntity(CoordinatorEntity):
     def __init__(
         self,
         coordinator: CasaTunesDataUpdateCoordinator,
-        zone: CasaTunesZone,
+        zone: ZoneRecord,
         device_id: str,
         zone_id: str,
     ) -> None:
@@ -123,15 +282,20 @@ class CasaTunesEntity(CoordinatorEntity):
         return self._name
 
     @property
-    def system(self) -> CasaTunesSystem:
+    def system(self) -> SystemRecord:
         """Get the CasaTunes System."""
         return self.coordinator.data.system
 
     @property
-    def zone(self) -> CasaTunesZone:
+    def zone(self) -> ZoneRecord:
         """Get the CasaTunes Zones."""
         return self.coordinator.data.zones_dict[self._zone_id]
 
+    @property
+    def nowplaying(self) -> NowPlayingRecord | None:
+        """Get the CasaTunes Now Playing of the zone's source."""
+        return self.coordinator.data.nowplaying_dict.get(self.zone.SourceID)
+
 class CasaTunesDeviceEntity(CasaTunesEntity):
     """Defines a CasaTunes device entity."""
 
@@ -5,13 +5,12 @@ from homeassistant.components.media_player import BrowseMedia
 from homeassistant.components.media_player.const import MediaClass
 from homeassistant.components.media_player.errors import BrowseError
 
+from .const import CT_ALLOWSELECT, CT_COLLECTION
+
 
 class UnknownMediaType(BrowseError):
     """Unknown media type."""
 
-CT_COLLECTION = 8
-CT_ALLOWSELECT = 8192
-
 BROWSE_LIMIT = 1000
 
 _LOGGER = logging.getLogger(__name__)
@@ -25,6 +24,10 @@ async def build_item_response(
         _LOGGER.debug("browse_media: %s: %s", media_content_type, media_content_id)
         if media_content_type in [None, "library"]:
             return await library_payload(casa_server, zone_id, media_content_id)
+        if media_content_type == "search":
+            return await search_payload(casa_server, zone_id, media_content_id)
+        if media_content_type == "queue":
+            return await queue_payload(casa_server, media_content_id)
 
     except UnknownMediaType as err:
         raise BrowseError(
@@ -43,7 +46,7 @@ async def item_payload(casa_server, item):
         thumbnail = (
             image_id
             if image_id.startswith(("http://", "https://"))
-            else await casa_server.data.get_image(image_id)
+            else await casa_server.casatunes.get_image(image_id)
         )
 
     flags = item["Flags"]
@@ -95,7 +98,7 @@ async def library_payload(casa_server, zone_id, media_content_id):
         opts["item_id"] = media_content_id
         content_id = media_content_id
 
-    result_detail = await casa_server.data.get_media(opts)
+    result_detail = await casa_server.casatunes.get_media(opts)
     _LOGGER.debug("Result detail %s", result_detail)
 
     list_title = "Browse Media"
@@ -112,9 +115,91 @@ async def library_payload(casa_server, zone_id, media_content_id):
         children=[],
     )
 
+    zone = casa_server.data.zones_dict.get(zone_id)
+    if (
+        content_id == "Explore"
+        and zone is not None
+        and zone.SourceID in casa_server.data.nowplaying_dict
+    ):
+        library_info.children.append(
+            BrowseMedia(
+                title="Queue",
+                media_class=MediaClass.PLAYLIST,
+                media_content_type="queue",
+                media_content_id=str(zone.SourceID),
+                can_play=False,
+                can_expand=True,
+            )
+        )
+
+    if content_id == "Explore" and (query := casa_server.search.last_query.get(zone_id)):
+        library_info.children.append(
+            BrowseMedia(
+                title=f"Search: {query}",
+                media_class=MediaClass.DIRECTORY,
+                media_content_type="search",
+                media_content_id=query,
+                can_play=False,
+                can_expand=True,
+            )
+        )
+
     if "MediaItems" in result_detail:
         for item in result_detail["MediaItems"]:
             entry = await item_payload(casa_server, item)
             library_info.children.append(entry)
 
     return library_info
+
+
+async def search_payload(casa_server, zone_id, query):
+    """Create response payload for search results."""
+
+    if not query:
+        raise UnknownMediaType()
+
+    query, items = await casa_server.search.async_search(
+        zone_id, query, debounce=True
+    )
+
+    search_info = BrowseMedia(
+        title=f"Search: {query}",
+        media_class=MediaClass.DIRECTORY,
+        media_content_type="search",
+        media_content_id=query,
+        can_play=False,
+        can_expand=True,
+        children=[],
+    )
+
+    for item in items:
+        search_info.children.append(await item_payload(casa_server, item))
+
+    return search_info
+
+
+async def queue_payload(casa_server, source_id):
+    """Create response payload for the play queue of a source."""
+
+    try:
+        nowplaying = casa_server.data.nowplaying_dict[int(source_id)]
+    except (KeyError, TypeError, ValueError) as err:
+        raise UnknownMediaType() from err
+
+    items = await casa_server.play_queue.async_get(nowplaying)
+
+    queue_info = BrowseMedia(
+        title="Queue",
+        media_class=MediaClass.PLAYLIST,
+        media_content_type="queue",
+        media_content_id=str(source_id),
+        can_play=False,
+        can_expand=True,
+        children=[],
+    )
+
+    # The queue starts at the current song, played songs aren't of interest.
+    for item in items:
+        queue_info.children.append(await item_payload(casa_server, item))
+
+    return queue_info
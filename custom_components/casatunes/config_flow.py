@@ -15,15 +15,15 @@ from homeassistant.components.ssdp import (
     ATTR_UPNP_SERIAL,
 )
 
-from homeassistant.config_entries import ConfigFlow
+from homeassistant.config_entries import ConfigEntry, ConfigFlow, OptionsFlow
 from homeassistant.const import CONF_HOST, CONF_NAME
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.typing import DiscoveryInfoType
 from homeassistant.helpers.device_registry import format_mac
 
-from .const import DOMAIN
+from . import async_create_session
+from .const import CONF_MAX_CONNECTIONS, DEFAULT_MAX_CONNECTIONS, DOMAIN
 
 DATA_SCHEMA = vol.Schema({vol.Required(CONF_HOST): str})
 
@@ -37,9 +37,9 @@ async def validate_input(hass: HomeAssistant, data: dict) -> dict:
     """Validate the user input allows us to connect.
     Data has the keys from DATA_SCHEMA with values provided by the user.
     """
-    session = async_get_clientsession(hass)
-    casa = CasaTunes(session, data[CONF_HOST])
-    system = await casa.get_system()
+    async with async_create_session() as session:
+        casa = CasaTunes(session, data[CONF_HOST])
+        system = await casa.get_system()
 
     return {
         "title": system.AppName,
@@ -57,6 +57,12 @@ class CasaTunesConfigFlow(ConfigFlow, domain=DOMAIN):
             vol.Required("host"): str,
         }
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        """Get the options flow for this handler."""
+        return CasaTunesOptionsFlow(config_entry)
+
     @callback
     def _show_form(self, errors: dict | None = None) -> FlowResult:
         """Show the form to the user."""
@@ -136,11 +142,38 @@ class CasaTunesConfigFlow(ConfigFlow, domain=DOMAIN):
 
     async def _async_get_mac(self, host: str) -> str:
         """Get system MAC address."""
-        session = async_get_clientsession(self.hass)
-        casa = CasaTunes(session, host)
+        async with async_create_session() as session:
+            casa = CasaTunes(session, host)
 
-        with async_timeout.timeout(30):
-            system = await casa.get_system()
+            with async_timeout.timeout(30):
+                system = await casa.get_system()
         
         if system.MACAddress is not None:
-            return system.MACAddress
\ No newline at end of file
+            return system.MACAddress
+
+
+class CasaTunesOptionsFlow(OptionsFlow):
+    """Handle CasaTunes options."""
+
+    def __init__(self, config_entry: ConfigEntry) -> None:
+        """Initialize options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input=None) -> FlowResult:
+        """Manage the connection options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_MAX_CONNECTIONS,
+                        default=self.config_entry.options.get(
+                            CONF_MAX_CONNECTIONS, DEFAULT_MAX_CONNECTIONS
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=32)),
+                }
+            ),
+        )
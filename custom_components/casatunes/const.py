@@ -1,7 +1,77 @@
 """Constants for the CasaTunes integration."""
 DOMAIN = "casatunes"
 
+# Connection
+CONF_MAX_CONNECTIONS = "max_connections"
+COMMAND_CONCURRENCY = 8
+DEFAULT_MAX_CONNECTIONS = COMMAND_CONCURRENCY
+CONNECT_TIMEOUT = 3
+REQUEST_TIMEOUT = 10
+KEEPALIVE_TIMEOUT = 60
+DNS_CACHE_TTL = 300
+
+# Events
+EVENT_TRACK_CHANGED = f"{DOMAIN}_track_changed"
+EVENT_SOURCE_CHANGED = f"{DOMAIN}_source_changed"
+EVENT_POWER_CHANGED = f"{DOMAIN}_power_changed"
+EVENT_GROUP_CHANGED = f"{DOMAIN}_group_changed"
+EVENT_VOLUME_CHANGED = f"{DOMAIN}_volume_changed"
+
+# Media item flags
+CT_COLLECTION = 8
+CT_ALLOWSELECT = 8192
+
 # Services
 SERVICE_SEARCH = "search"
 SERVICE_TTS = "tts"
 SERVICE_DOORBELL = "doorbell"
+SERVICE_BULK = "bulk"
+SERVICE_SAVE_PRESET = "save_preset"
+SERVICE_RESTORE_PRESET = "restore_preset"
+SERVICE_DELETE_PRESET = "delete_preset"
+
+# Playback position
+POSITION_TOLERANCE = 3
+PROGRESS_INTERVAL = 1
+
+# Search
+ATTR_QUERY = "query"
+ATTR_KEYWORD_ARTIST = "keyword_artist"
+ATTR_KEYWORD_ALBUM = "keyword_album"
+ATTR_KEYWORD_TRACK_NAME = "keyword_track_name"
+ATTR_MODE = "mode"
+
+SEARCH_CACHE_SIZE = 64
+SEARCH_CACHE_TTL = 300
+SEARCH_DEBOUNCE = 0.3
+SEARCH_LIMIT = 50
+
+# Play queue
+QUEUE_LIMIT = 1000
+
+# Bulk zone control
+ATTR_ZONES = "zones"
+ATTR_POWER = "power"
+ATTR_VOLUME = "volume"
+ATTR_MUTE = "mute"
+ATTR_SOURCE = "source"
+ATTR_GROUP = "group"
+ATTR_SHUFFLE = "shuffle"
+
+# Presets
+ATTR_NAME = "name"
+
+# Announcements
+ATTR_CHIME = "chime"
+ATTR_INPUT = "input"
+ATTR_LANGUAGE_CODE = "language_code"
+ATTR_GENDER = "gender"
+ATTR_VOICE = "voice"
+ATTR_PRE_WAIT = "pre_wait"
+ATTR_POST_WAIT = "post_wait"
+ATTR_DURATION = "duration"
+
+DEFAULT_CHIME = "CasaBell 7 Seconds NoDelay"
+DEFAULT_CHIME_DURATION = 7
+TTS_WORDS_PER_SECOND = 2.5
+TTS_RENDER_TIME = 3
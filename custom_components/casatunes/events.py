@@ -0,0 +1,116 @@
+"""Change events for the CasaTunes integration."""
+from __future__ import annotations
+
+from typing import Any
+
+from .const import (
+    EVENT_GROUP_CHANGED,
+    EVENT_POWER_CHANGED,
+    EVENT_SOURCE_CHANGED,
+    EVENT_TRACK_CHANGED,
+    EVENT_VOLUME_CHANGED,
+)
+from .snapshot import CasaTunesSnapshot, group_masters
+
+
+def snapshot_changes(
+    previous: CasaTunesSnapshot,
+    current: CasaTunesSnapshot,
+    entity_ids: dict[str, str],
+) -> list[tuple[str, dict[str, Any]]]:
+    """Return the typed events describing what changed between two snapshots.
+
+    Unchanged records are shared between snapshots, so zones and sources
+    that didn't change are skipped with an identity check.
+    """
+    events: list[tuple[str, dict[str, Any]]] = []
+
+    changed_songs = set()
+    for item in current.nowplaying:
+        old_item = previous.nowplaying_dict.get(item.SourceID)
+        if old_item is None or item is old_item or item.CurrSong is old_item.CurrSong:
+            continue
+        if (item.CurrSong.ID, item.CurrSong.Title) != (
+            old_item.CurrSong.ID,
+            old_item.CurrSong.Title,
+        ):
+            changed_songs.add(item.SourceID)
+
+    old_groups = new_groups = None
+    for zone in current.zones:
+        old_zone = previous.zones_dict.get(zone.ZoneID)
+        if old_zone is None:
+            continue
+        if old_zone is not zone and (zone.SharedRoomID, zone.MasterMode) != (
+            old_zone.SharedRoomID,
+            old_zone.MasterMode,
+        ):
+            old_groups = group_masters(previous)
+            new_groups = group_masters(current)
+            break
+
+    for zone in current.zones:
+        old_zone = previous.zones_dict.get(zone.ZoneID)
+        if old_zone is None:
+            continue
+
+        base = {"zone_id": zone.ZoneID, "entity_id": entity_ids.get(zone.ZoneID)}
+
+        if zone is not old_zone:
+            if zone.Power != old_zone.Power:
+                events.append((EVENT_POWER_CHANGED, {**base, "power": zone.Power}))
+            if zone.SourceID != old_zone.SourceID:
+                source = current.sources_dict.get(zone.SourceID)
+                old_source = previous.sources_dict.get(old_zone.SourceID)
+                events.append(
+                    (
+                        EVENT_SOURCE_CHANGED,
+                        {
+                            **base,
+                            "source": source.Name if source else None,
+                            "old_source": old_source.Name if old_source else None,
+                        },
+                    )
+                )
+            if (zone.Volume, zone.Mute) != (old_zone.Volume, old_zone.Mute):
+                events.append(
+                    (
+                        EVENT_VOLUME_CHANGED,
+                        {
+                            **base,
+                            "volume": zone.Volume,
+                            "old_volume": old_zone.Volume,
+                            "muted": zone.Mute,
+                        },
+                    )
+                )
+
+        if new_groups is not None and (
+            new_groups[zone.ZoneID] != old_groups.get(zone.ZoneID)
+        ):
+            events.append(
+                (
+                    EVENT_GROUP_CHANGED,
+                    {
+                        **base,
+                        "group": new_groups[zone.ZoneID],
+                        "old_group": old_groups.get(zone.ZoneID),
+                    },
+                )
+            )
+
+        if zone.Power and zone.SourceID in changed_songs:
+            song = current.nowplaying_dict[zone.SourceID].CurrSong
+            events.append(
+                (
+                    EVENT_TRACK_CHANGED,
+                    {
+                        **base,
+                        "title": song.Title,
+                        "artists": song.Artists,
+                        "album": song.Album,
+                    },
+                )
+            )
+
+    return events
@@ -1,16 +1,18 @@
 """Support for the CasaTunes media player."""
 from __future__ import annotations
 
+import asyncio
 import logging
 
+from aiohttp import ClientError
 import voluptuous as vol
 
 from homeassistant.util.dt import utcnow
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
-from pycasatunes.objects.zone import CasaTunesZone
 
 from homeassistant.components.media_player import (
+    DOMAIN as MEDIA_PLAYER_DOMAIN,
     MediaPlayerDeviceClass,
     MediaType,
     MediaPlayerEntity,
@@ -24,11 +26,28 @@ from homeassistant.const import (
     STATE_PAUSED,
     STATE_PLAYING,
 )
+from homeassistant.core import ServiceCall, SupportsResponse, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity import Entity
-from homeassistant.helpers import entity_platform
-
-from .const import ATTR_KEYWORD, DOMAIN, SERVICE_SEARCH
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.entity_platform import DATA_ENTITY_PLATFORM
+from homeassistant.helpers.service import entity_service_call
+
+from pycasatunes.exceptions import CasaException
+
+from .const import (
+    ATTR_KEYWORD_ALBUM,
+    ATTR_KEYWORD_ARTIST,
+    ATTR_KEYWORD_TRACK_NAME,
+    ATTR_MODE,
+    ATTR_QUERY,
+    DOMAIN,
+    POSITION_TOLERANCE,
+    SERVICE_SEARCH,
+)
 from .browse_media import build_item_response
+from .search import rank_keywords, search_result
+from .snapshot import ZoneRecord
 from . import CasaTunesDataUpdateCoordinator, CasaTunesDeviceEntity
 
 SUPPORT_CASATUNES = (
@@ -53,7 +72,17 @@ SUPPORT_CASATUNES = (
 
 STATUS_TO_STATES = {0: STATE_IDLE, 1: STATE_PAUSED, 2: STATE_PLAYING, 3: STATE_ON}
 
-SEARCH_SCHEMA = {vol.Required(ATTR_KEYWORD): str}
+SEARCH_SCHEMA = cv.make_entity_service_schema(
+    {
+        vol.Optional(ATTR_QUERY): cv.string,
+        vol.Optional(ATTR_KEYWORD_ARTIST): cv.string,
+        vol.Optional(ATTR_KEYWORD_ALBUM): cv.string,
+        vol.Optional(ATTR_KEYWORD_TRACK_NAME): cv.string,
+        vol.Optional(ATTR_MODE): vol.In(
+            ["playNow", "playShuffle", "playUnshuffle", "add", "addplay"]
+        ),
+    }
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -64,18 +93,36 @@ async def async_setup_entry(hass, entry, async_add_entities):
 
     media_players: list[Entity] = []
 
-    unique_id = coordinator.data.system.attributes["MACAddress"]
+    unique_id = coordinator.data.system.MACAddress
 
     for zone in coordinator.data.zones:
         media_players.append(CasaTunesMediaPlayer(coordinator, zone, unique_id))
 
     async_add_entities(media_players)
 
-    platform = entity_platform.async_get_current_platform()
-    platform.async_register_entity_service(
+    if hass.services.has_service(DOMAIN, SERVICE_SEARCH):
+        return
+
+    async def async_handle_search(call: ServiceCall):
+        """Dispatch the search service and return the entity's results."""
+        return await entity_service_call(
+            hass,
+            [
+                platform
+                for platform in hass.data[DATA_ENTITY_PLATFORM][DOMAIN]
+                if platform.domain == MEDIA_PLAYER_DOMAIN
+            ],
+            "async_search",
+            call,
+        )
+
+    # Registered directly, entity services can't return responses on this HA version.
+    hass.services.async_register(
+        DOMAIN,
         SERVICE_SEARCH,
+        async_handle_search,
         SEARCH_SCHEMA,
-        "search",
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
 
@@ -85,7 +132,7 @@ class CasaTunesMediaPlayer(CasaTunesDeviceEntity, MediaPlayerEntity):
     def __init__(
         self,
         coordinator: DataUpdateCoordinator,
-        zone: CasaTunesZone,
+        zone: ZoneRecord,
         unique_id: str,
     ) -> None:
         """Initialize CasaTunes sensor."""
@@ -100,7 +147,10 @@ class CasaTunesMediaPlayer(CasaTunesDeviceEntity, MediaPlayerEntity):
         self._attr_supported_features = SUPPORT_CASATUNES
         self._server = coordinator
         self._zone_id = zone.ZoneID
+        self._media_position = None
         self._media_position_updated_at = None
+        self._media_position_playing = False
+        self._update_media_position()
 
     async def async_added_to_hass(self):
         """Entity being added to hass."""
@@ -112,17 +162,59 @@ class CasaTunesMediaPlayer(CasaTunesDeviceEntity, MediaPlayerEntity):
         await super().async_will_remove_from_hass()
         self.coordinator.entities.remove(self)
 
-    def _media_playback_trackable(self) -> bool:
-        """Detect if we have enough media data to track playback."""
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        self._update_media_position()
+        super()._handle_coordinator_update()
+
+    def _update_media_position(self) -> None:
+        """Track the reported position, only moving the timestamp on a jump.
+
+        While playing, a new CurrProgress that matches the position advanced
+        by wall-clock time keeps the previous position and timestamp, so the
+        state attributes stay unchanged between polls and the frontend can
+        keep interpolating from them.
+        """
+        position = None
+        if self._media_playback_trackable():
+            position = self.nowplaying.CurrProgress
+        if position is None:
+            self._media_position = None
+            self._media_position_updated_at = None
+            return
+
+        playing = self.state == STATE_PLAYING
         if (
-            0 <= self.zone.SourceID < len(self.coordinator.data.nowplaying)
-            and self.coordinator.data.nowplaying[self.zone.SourceID].CurrSong.Duration
-            is not None
+            self._media_position is None
+            or playing != self._media_position_playing
+            or abs(position - self.interpolated_media_position()) > POSITION_TOLERANCE
         ):
-            return (
-                self.coordinator.data.nowplaying[self.zone.SourceID].CurrSong.Duration
-                > 0
-            )
+            self._media_position = position
+            self._media_position_updated_at = utcnow()
+            self._media_position_playing = playing
+
+    def interpolated_media_position(self) -> float | None:
+        """Return the current position, advanced locally while playing.
+
+        The position isn't advanced past the duration, since the next poll
+        that reports the following song can be a full update interval away.
+        """
+        if self._media_position is None:
+            return None
+        if not self._media_position_playing:
+            return self._media_position
+        elapsed = (utcnow() - self._media_position_updated_at).total_seconds()
+        position = self._media_position + elapsed
+        if (duration := self.media_duration) is not None:
+            return min(position, duration)
+        return position
+
+    def _media_playback_trackable(self) -> bool:
+        """Detect if we have enough media data to track playback."""
+        nowplaying = self.nowplaying
+        if nowplaying is not None and nowplaying.CurrSong.Duration is not None:
+            return nowplaying.CurrSong.Duration > 0
 
         return False
 
@@ -164,21 +256,17 @@ class CasaTunesMediaPlayer(CasaTunesDeviceEntity, MediaPlayerEntity):
     def state(self) -> str | None:
         """Return the state of the device."""
         if self.zone.Power:
-            if 0 <= self.zone.SourceID < len(self.coordinator.data.nowplaying):
-                curr_song = self.coordinator.data.nowplaying[
-                    self.zone.SourceID
-                ].CurrSong
-                if curr_song is not None:
-                    state = self.coordinator.data.nowplaying[self.zone.SourceID].Status
-                    return STATUS_TO_STATES.get(state, None)
+            nowplaying = self.nowplaying
+            if nowplaying is not None and nowplaying.CurrSong is not None:
+                return STATUS_TO_STATES.get(nowplaying.Status, None)
             return STATE_ON
         return STATE_OFF
 
     @property
     def shuffle(self):
         """Boolean if shuffle is enabled."""
-        if 0 <= self.zone.SourceID < len(self.coordinator.data.nowplaying):
-            return self.coordinator.data.nowplaying[self.zone.SourceID].ShuffleMode
+        if (nowplaying := self.nowplaying) is not None:
+            return nowplaying.ShuffleMode
         return None
 
     @property
@@ -209,57 +297,49 @@ class CasaTunesMediaPlayer(CasaTunesDeviceEntity, MediaPlayerEntity):
     @property
     def media_track(self):
         """Return the track number of current media (Music track only)."""
-        if 0 <= self.zone.SourceID < len(self.coordinator.data.nowplaying):
-            return self.coordinator.data.nowplaying[self.zone.SourceID].QueueSongIndex
+        if (nowplaying := self.nowplaying) is not None:
+            return nowplaying.QueueSongIndex
         return None
 
     @property
     def media_title(self):
         """Title of current playing media."""
-        if 0 <= self.zone.SourceID < len(self.coordinator.data.nowplaying):
-            return self.coordinator.data.nowplaying[self.zone.SourceID].CurrSong.Title
+        if (nowplaying := self.nowplaying) is not None:
+            return nowplaying.CurrSong.Title
         return None
 
     @property
     def media_artist(self):
         """Artist of current playing media, music track only."""
-        if 0 <= self.zone.SourceID < len(self.coordinator.data.nowplaying):
-            return self.coordinator.data.nowplaying[self.zone.SourceID].CurrSong.Artists
+        if (nowplaying := self.nowplaying) is not None:
+            return nowplaying.CurrSong.Artists
         return None
 
     @property
     def media_album_name(self):
         """Album name of current playing media, music track only."""
-        if 0 <= self.zone.SourceID < len(self.coordinator.data.nowplaying):
-            return self.coordinator.data.nowplaying[self.zone.SourceID].CurrSong.Album
+        if (nowplaying := self.nowplaying) is not None:
+            return nowplaying.CurrSong.Album
         return None
 
     @property
     def media_duration(self) -> int | None:
         """Duration of current playing media in seconds."""
         if self._media_playback_trackable():
-            return self.coordinator.data.nowplaying[
-                self.zone.SourceID
-            ].CurrSong.Duration
+            return self.nowplaying.CurrSong.Duration
         return None
 
     @property
     def media_position(self):
         """Position of current playing media in seconds."""
-        if self._media_playback_trackable():
-            self._media_position_updated_at = utcnow()
-            return self.coordinator.data.nowplaying[self.zone.SourceID].CurrProgress
-        return None
+        return self._media_position
 
     @property
     def media_position_updated_at(self):
         """When was the position of the current playing media valid.
         Returns value from homeassistant.util.dt.utcnow().
         """
-        if self._media_playback_trackable():
-            return self._media_position_updated_at
-
-        return None
+        return self._media_position_updated_at
 
     @property
     def media_content_type(self):
@@ -270,10 +350,8 @@ class CasaTunesMediaPlayer(CasaTunesDeviceEntity, MediaPlayerEntity):
     @property
     def media_image_url(self):
         """Image url of current playing media."""
-        if 0 <= self.zone.SourceID < len(self.coordinator.data.nowplaying):
-            return self.coordinator.data.nowplaying[
-                self.zone.SourceID
-            ].CurrSong.ArtworkURI
+        if (nowplaying := self.nowplaying) is not None:
+            return nowplaying.CurrSong.ArtworkURI
         return None
 
     @property
@@ -310,67 +388,66 @@ class CasaTunesMediaPlayer(CasaTunesDeviceEntity, MediaPlayerEntity):
     async def sync_master(self):
         """If there are no clients left in master zone, remove master flag."""
         if not [entity for entity in self._casatunes_entities() if entity.is_client]:
-            await self.coordinator.data.zone_master(self.zone_master, False)
+            await self.coordinator.casatunes.zone_master(self.zone_master, False)
             await self.coordinator.async_refresh()
             _LOGGER.debug("%s zone is no longer master.", self.zone_master)
 
     async def async_turn_on(self):
         """Turn the media player on."""
-        await self.coordinator.data.turn_on(self.zone_id)
+        await self.coordinator.casatunes.turn_on(self.zone_id)
         await self.coordinator.async_refresh()
 
     async def async_turn_off(self):
         """Turn the media player off."""
-        await self.coordinator.data.turn_off(self.zone_id)
+        await self.coordinator.casatunes.turn_off(self.zone_id)
         await self.coordinator.async_refresh()
 
     async def async_set_volume_level(self, volume):
         """Set the volume level."""
-        await self.coordinator.data.set_volume_level(self.zone_id, int(volume * 100))
+        await self.coordinator.casatunes.set_volume_level(self.zone_id, int(volume * 100))
         await self.coordinator.async_refresh()
 
     async def async_mute_volume(self, mute):
         """Mute the volume."""
-        await self.coordinator.data.mute_volume(self.zone_id, mute)
+        await self.coordinator.casatunes.mute_volume(self.zone_id, mute)
         await self.coordinator.async_refresh()
 
     async def async_media_seek(self, position):
         """Send seek command."""
-        await self.coordinator.data.player_action(
+        await self.coordinator.casatunes.player_action(
             self.zone_id, "Position", int(position)
         )
-        self._media_position_updated_at = utcnow()
         await self.coordinator.async_refresh()
 
     async def async_media_previous_track(self):
         """Send previous track command."""
-        await self.coordinator.data.player_action(self.zone_id, "previous")
+        await self.coordinator.casatunes.player_action(self.zone_id, "previous")
         await self.coordinator.async_refresh()
 
     async def async_media_next_track(self):
         """Send next track command."""
-        await self.coordinator.data.player_action(self.zone_id, "next")
+        await self.coordinator.casatunes.player_action(self.zone_id, "next")
         await self.coordinator.async_refresh()
 
     async def async_media_play(self):
         """Send play command."""
-        await self.coordinator.data.player_action(self.zone_id, "play")
+        await self.coordinator.casatunes.player_action(self.zone_id, "play")
         await self.coordinator.async_refresh()
 
     async def async_media_pause(self):
         """Send pause command."""
-        await self.coordinator.data.player_action(self.zone_id, "pause")
+        await self.coordinator.casatunes.player_action(self.zone_id, "pause")
         await self.coordinator.async_refresh()
 
     async def async_media_stop(self):
         """Send pause command."""
-        await self.coordinator.data.player_action(self.zone_id, "stop")
+        await self.coordinator.casatunes.player_action(self.zone_id, "stop")
         await self.coordinator.async_refresh()
 
     async def async_set_shuffle(self, shuffle):
         """Enable/disable shuffle mode."""
         str_flag = "true" if shuffle else "false"
-        await self.coordinator.data.player_action(
+        await self.coordinator.casatunes.player_action(
             self.zone_id, "shuffle", f"ShuffleMode={str_flag}"
         )
         await self.coordinator.async_refresh()
@@ -380,7 +457,7 @@ class CasaTunesMediaPlayer(CasaTunesDeviceEntity, MediaPlayerEntity):
         for source_item in self.coordinator.data.sources:
             if source_item.Name == source:
                 """If zone is a client on a zone, we should leave."""
-                await self.coordinator.data.change_source(
+                await self.coordinator.casatunes.change_source(
                     self.zone_id, source_item.SourceID
                 )
                 await self.coordinator.async_refresh()
@@ -396,7 +473,7 @@ class CasaTunesMediaPlayer(CasaTunesDeviceEntity, MediaPlayerEntity):
         )
 
         """Make sure self.zone is or becomes master."""
-        await self.coordinator.data.zone_master(self.zone_id, True)
+        await self.coordinator.casatunes.zone_master(self.zone_id, True)
 
         entities = [
             entity
@@ -406,14 +483,14 @@ class CasaTunesMediaPlayer(CasaTunesDeviceEntity, MediaPlayerEntity):
 
         for client in entities:
             if client != self:
-                await self.coordinator.data.zone_join(self.zone_id, client.zone_id)
+                await self.coordinator.casatunes.zone_join(self.zone_id, client.zone_id)
 
         await self.coordinator.async_refresh()
         await self.sync_master()
 
     async def async_unjoin_player(self):
         """Remove this player from any group."""
-        await self.coordinator.data.zone_unjoin(self.zone_master, self.zone_id)
+        await self.coordinator.casatunes.zone_unjoin(self.zone_master, self.zone_id)
         await self.coordinator.async_refresh()
         await self.sync_master()
 
@@ -429,13 +506,56 @@ class CasaTunesMediaPlayer(CasaTunesDeviceEntity, MediaPlayerEntity):
     async def async_play_media(self, media_type, media_id, **kwargs):
         """Send the play_media command to the media player."""
         _LOGGER.debug("Playback request for %s / %s", media_type, media_id)
-        await self.coordinator.data.play_media(self.zone_id, media_id)
+        await self.coordinator.casatunes.play_media(self.zone_id, media_id)
         await self.coordinator.async_refresh()
 
     async def async_clear_playlist(self):
         """Send the media player the command for clear playlist."""
-        await self.coordinator.data.clear_playlist(self.zone.SourceID)
+        await self.coordinator.casatunes.clear_playlist(self.zone.SourceID)
+        self.coordinator.play_queue.invalidate(self.zone.SourceID)
+        await self.coordinator.async_refresh()
+
+    async def async_search(
+        self,
+        query=None,
+        keyword_artist=None,
+        keyword_album=None,
+        keyword_track_name=None,
+        mode=None,
+    ):
+        """Search media and return ranked results, optionally queueing the best."""
+        terms = [
+            term
+            for term in (query, keyword_artist, keyword_album, keyword_track_name)
+            if term
+        ]
+        if not terms:
+            raise HomeAssistantError("Search requires a query or keyword")
+
+        query = " ".join(terms)
+        try:
+            query, items = await self.coordinator.search.async_search(
+                self.zone_id, query
+            )
+        except (CasaException, ClientError, asyncio.TimeoutError) as err:
+            raise HomeAssistantError(f"Search for {query} failed") from err
+
+        keywords = {
+            "artist": keyword_artist,
+            "album": keyword_album,
+            "track": keyword_track_name,
+        }
+        if any(keywords.values()):
+            items = rank_keywords(keywords, items)
+
+        results = [search_result(item) for item in items]
+
+        if mode is not None:
+            playable = [result for result in results if result["playable"]]
+            if playable:
+                await self.coordinator.casatunes.queue_media(
+                    self.zone_id, playable[0]["id"], mode
+                )
+                await self.coordinator.async_refresh()
 
-    async def search(self, keyword):
-        """Emulate opening the search screen and entering the search keyword."""
-        await self.coordinator.data.search_media(self.zone_id, keyword)
+        return {"query": query, "items": results}
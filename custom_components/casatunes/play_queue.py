@@ -0,0 +1,103 @@
+"""Play queue support for the CasaTunes integration."""
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+import logging
+from typing import Any
+
+from aiohttp import ClientSession
+from pycasatunes.const import API_PORT
+from pycasatunes.exceptions import CasaException
+
+from .const import QUEUE_LIMIT
+from .snapshot import NowPlayingRecord
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CasaTunesPlayQueue:
+    """Cache a window of each source's play queue and keep it current.
+
+    The window starts at the current song and holds up to QUEUE_LIMIT items,
+    so long queues are shown from where playback is rather than from the
+    start. The now playing ChangeQueueID, QueueSongIndex and QueueCount then
+    decide what to fetch: nothing if the window is still complete, just the
+    items past its end if the song index moved forward or items were
+    appended, and the whole window only when the queue was otherwise changed.
+    """
+
+    def __init__(self, session: ClientSession, host: str) -> None:
+        """Initialize."""
+        self._session = session
+        self._host = host
+        self._cache: dict[int, tuple[Any, int, list[dict[str, Any]]]] = {}
+        self._locks: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    def invalidate(self, source_id: int) -> None:
+        """Forget the cached queue of a source."""
+        self._cache.pop(source_id, None)
+
+    async def async_get(self, nowplaying: NowPlayingRecord) -> list[dict[str, Any]]:
+        """Return the queue of a source from the current song on."""
+        source_id = nowplaying.SourceID
+        change_id = nowplaying.ChangeQueueID
+        count = max(nowplaying.QueueCount or 0, 0)
+        index = min(max(nowplaying.QueueSongIndex or 0, 0), count)
+        limit = min(count - index, QUEUE_LIMIT)
+
+        async with self._locks[source_id]:
+            cached_id, start, items = self._cache.get(source_id, (None, 0, None))
+            # A ChangeQueueID of None tells nothing about the queue.
+            unchanged = change_id is not None and cached_id == change_id
+            end = start + len(items) if items is not None else start
+            window = None
+
+            if items is not None and start <= index <= end:
+                kept = items[index - start :]
+                if unchanged and len(kept) >= limit:
+                    window = kept[:limit]
+                elif unchanged:
+                    _LOGGER.debug(
+                        "Sliding queue window of source %s to %s", source_id, index
+                    )
+                    window = kept + await self._async_fetch(
+                        source_id, end, index + limit - end
+                    )
+                elif kept and index + limit > end:
+                    # Fetch from the last cached item, which confirms the queue
+                    # was only appended to and not replaced by a longer one.
+                    tail = await self._async_fetch(
+                        source_id, end - 1, index + limit - end + 1
+                    )
+                    if tail and tail[0].get("ID") == kept[-1].get("ID"):
+                        _LOGGER.debug(
+                            "Fetched %s appended items for source %s",
+                            len(tail) - 1,
+                            source_id,
+                        )
+                        window = kept + tail[1:]
+
+            if window is None:
+                window = await self._async_fetch(source_id, index, limit)
+
+            self._cache[source_id] = (change_id, index, window)
+            return window
+
+    async def _async_fetch(
+        self, source_id: int, start: int, limit: int
+    ) -> list[dict[str, Any]]:
+        """Fetch a range of queue items from the server."""
+        if limit <= 0:
+            return []
+
+        url = f"http://{self._host}:{API_PORT}/api/v1/sources/{source_id}/queue?start={start}&limit={limit}"
+        async with self._session.get(url) as response:
+            if response.status != 200:
+                raise CasaException({"url": url, "status": response.status})
+            json = await response.json()
+
+        _LOGGER.debug("Queue for source %s: %s", source_id, json)
+        if isinstance(json, dict):
+            return json.get("MediaItems", [])
+        return json or []
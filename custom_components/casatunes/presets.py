@@ -0,0 +1,45 @@
+"""Zone presets for the CasaTunes integration."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+STORAGE_VERSION = 1
+
+
+class CasaTunesPresets:
+    """Named zone state presets for a CasaTunes server, kept in HA storage."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize."""
+        self._store: Store[dict[str, dict[str, dict[str, Any]]]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.presets"
+        )
+        self._presets: dict[str, dict[str, dict[str, Any]]] = {}
+
+    @property
+    def names(self) -> list[str]:
+        """Return the names of the saved presets."""
+        return sorted(self._presets)
+
+    def get(self, name: str) -> dict[str, dict[str, Any]] | None:
+        """Return the saved zone states of a preset."""
+        return self._presets.get(name)
+
+    async def async_load(self) -> None:
+        """Load presets from storage."""
+        self._presets = await self._store.async_load() or {}
+
+    async def async_save(self, name: str, zones: dict[str, dict[str, Any]]) -> None:
+        """Save zone states under a preset name."""
+        self._presets[name] = zones
+        await self._store.async_save(self._presets)
+
+    async def async_delete(self, name: str) -> None:
+        """Delete a preset."""
+        if self._presets.pop(name, None) is not None:
+            await self._store.async_save(self._presets)
@@ -0,0 +1,223 @@
+"""Search support for the CasaTunes integration."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import logging
+import time
+from typing import Any
+from urllib.parse import quote
+
+from aiohttp import ClientSession
+from pycasatunes.const import API_PORT
+from pycasatunes.exceptions import CasaException
+
+from .const import (
+    CT_ALLOWSELECT,
+    CT_COLLECTION,
+    SEARCH_CACHE_SIZE,
+    SEARCH_CACHE_TTL,
+    SEARCH_DEBOUNCE,
+    SEARCH_LIMIT,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so equivalent keystrokes share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+def rank_items(query: str, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Rank media items by how well their title and artists match the query."""
+    terms = query.split()
+
+    def score(item: dict[str, Any]) -> int:
+        title = (item.get("Title") or "").lower()
+        artists = (item.get("Artists") or "").lower()
+        points = 0
+        for term in terms:
+            if term in title:
+                points += 2
+            if term in artists:
+                points += 1
+        if title == query:
+            points += 4
+        elif title.startswith(query):
+            points += 2
+        return points
+
+    # sorted() is stable, so equal scores keep the order the server returned.
+    return sorted(items, key=score, reverse=True)[:SEARCH_LIMIT]
+
+
+# Keyword field: (item key it matches, GroupName it selects, weight)
+KEYWORD_FIELDS = {
+    "artist": ("Artists", "artists", 3),
+    "album": ("Title", "albums", 2),
+    "track": ("Title", "tracks", 1),
+}
+
+
+def rank_keywords(
+    keywords: dict[str, str], items: list[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    """Rank media items by the keyword fields they match, like search_media.
+
+    An item scores the weights of the fields it matches, but only if one of
+    those fields selects its group, so an artist keyword ranks artists and
+    not tracks whose title happens to contain it.
+    """
+    keywords = {
+        field: normalize_query(keyword)
+        for field, keyword in keywords.items()
+        if keyword
+    }
+
+    def score(item: dict[str, Any]) -> int:
+        group = (item.get("GroupName") or "").lower()
+        points = 0
+        in_group = False
+        for field, keyword in keywords.items():
+            key, group_name, weight = KEYWORD_FIELDS[field]
+            value = (item.get(key) or "").lower()
+            if group == group_name == "artists":
+                # An artist item carries the artist name as its title.
+                value = f"{value} {(item.get('Title') or '').lower()}"
+            if keyword in value:
+                points += weight
+                in_group |= group == group_name
+        return points if in_group else 0
+
+    # sorted() is stable, so equal scores keep the free text ranking.
+    return sorted(items, key=score, reverse=True)
+
+
+def search_result(item: dict[str, Any]) -> dict[str, Any]:
+    """Return the compact service response for a single media item."""
+    flags = item.get("Flags") or 0
+    if flags & CT_COLLECTION:
+        media_type = (item.get("GroupName") or "library").lower()
+    else:
+        media_type = "track"
+
+    return {
+        "id": item["ID"],
+        "title": item.get("Title"),
+        "artists": item.get("Artists"),
+        "type": media_type,
+        "playable": not flags & CT_COLLECTION or bool(flags & CT_ALLOWSELECT),
+    }
+
+
+class CasaTunesSearch:
+    """Run searches against a CasaTunes server with caching and debouncing.
+
+    Results are cached per zone and normalized query in a bounded LRU cache.
+    Debounced type-ahead queries for a zone that arrive within SEARCH_DEBOUNCE
+    of each other wait for a pause, and a query that a newer one extends is
+    collapsed into it, so typing only hits the server once the user pauses.
+    """
+
+    def __init__(self, session: ClientSession, host: str) -> None:
+        """Initialize."""
+        self._session = session
+        self._host = host
+        self._cache: OrderedDict[
+            tuple[str, str], tuple[float, list[dict[str, Any]]]
+        ] = OrderedDict()
+        self._pending: dict[str, tuple[str, asyncio.Future]] = {}
+        self._last_keystroke: dict[str, float] = {}
+        self.last_query: dict[str, str] = {}
+
+    def cached(self, zone_id: str, query: str) -> list[dict[str, Any]] | None:
+        """Return cached results for a query, if still fresh."""
+        key = (zone_id, normalize_query(query))
+        if (entry := self._cache.get(key)) is None:
+            return None
+        if time.monotonic() - entry[0] > SEARCH_CACHE_TTL:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[1]
+
+    async def async_search(
+        self, zone_id: str, query: str, debounce: bool = False
+    ) -> tuple[str, list[dict[str, Any]]]:
+        """Search media for a zone, returning the query run and ranked items.
+
+        With debounce, a query made while the user is still typing waits for
+        a pause, and resolves with the newer query's results if the newer
+        query extends it. Without debounce, results are always for the query.
+        """
+        query = normalize_query(query)
+        if (items := self.cached(zone_id, query)) is not None:
+            self.last_query[zone_id] = query
+            return query, items
+
+        if not debounce:
+            return await self._async_run(zone_id, query)
+
+        now = time.monotonic()
+        last = self._last_keystroke.get(zone_id)
+        typing = last is not None and now - last < SEARCH_DEBOUNCE
+        self._last_keystroke[zone_id] = now
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending[zone_id] = (query, future)
+        try:
+            if typing:
+                await asyncio.sleep(SEARCH_DEBOUNCE)
+            latest_query, latest = self._pending.get(zone_id, (None, None))
+            if (
+                latest is not None
+                and latest is not future
+                and latest_query.startswith(query)
+            ):
+                _LOGGER.debug("Search for %s superseded by %s", query, latest_query)
+                result = await asyncio.shield(latest)
+            else:
+                result = await self._async_run(zone_id, query)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as err:
+            future.set_exception(err)
+            # Mark the exception retrieved if nobody chained onto this query.
+            future.exception()
+            raise
+        finally:
+            if self._pending.get(zone_id, (None, None))[1] is future:
+                del self._pending[zone_id]
+
+        future.set_result(result)
+        return result
+
+    async def _async_run(
+        self, zone_id: str, query: str
+    ) -> tuple[str, list[dict[str, Any]]]:
+        """Fetch and cache the results of a query."""
+        items = await self._async_fetch(zone_id, query)
+        self._store(zone_id, query, items)
+        self.last_query[zone_id] = query
+        return query, items
+
+    def _store(self, zone_id: str, query: str, items: list[dict[str, Any]]) -> None:
+        """Store results, evicting the least recently used query if full."""
+        self._cache[(zone_id, query)] = (time.monotonic(), items)
+        self._cache.move_to_end((zone_id, query))
+        while len(self._cache) > SEARCH_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    async def _async_fetch(self, zone_id: str, query: str) -> list[dict[str, Any]]:
+        """Fetch and rank search results from the server."""
+        search_query = "+".join(quote(term) for term in query.split())
+        url = f"http://{self._host}:{API_PORT}/api/v1/media/zones/{zone_id}/search/{search_query}"
+        async with self._session.get(url) as response:
+            if response.status != 200:
+                raise CasaException({"url": url, "status": response.status})
+            json = await response.json()
+
+        _LOGGER.debug("Search %s returned %s", query, json)
+        return rank_items(query, (json or {}).get("MediaItems", []))
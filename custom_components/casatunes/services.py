@@ -0,0 +1,614 @@
+"""Services for the CasaTunes integration."""
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from functools import partial
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_ENTITY_ID, ENTITY_MATCH_ALL
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.service import async_extract_entity_ids
+
+from .const import (
+    ATTR_CHIME,
+    ATTR_DURATION,
+    ATTR_GENDER,
+    ATTR_GROUP,
+    ATTR_INPUT,
+    ATTR_LANGUAGE_CODE,
+    ATTR_MUTE,
+    ATTR_NAME,
+    ATTR_POST_WAIT,
+    ATTR_PRE_WAIT,
+    ATTR_POWER,
+    ATTR_SHUFFLE,
+    ATTR_SOURCE,
+    ATTR_VOICE,
+    ATTR_VOLUME,
+    ATTR_ZONES,
+    DEFAULT_CHIME,
+    DEFAULT_CHIME_DURATION,
+    DOMAIN,
+    SERVICE_BULK,
+    SERVICE_DELETE_PRESET,
+    SERVICE_DOORBELL,
+    SERVICE_RESTORE_PRESET,
+    SERVICE_SAVE_PRESET,
+    SERVICE_TTS,
+    TTS_RENDER_TIME,
+    TTS_WORDS_PER_SECOND,
+)
+from .snapshot import group_masters
+
+if TYPE_CHECKING:
+    from . import CasaTunesDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+ZONE_TARGET_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Optional(ATTR_POWER): cv.boolean,
+        vol.Optional(ATTR_VOLUME): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+        vol.Optional(ATTR_MUTE): cv.boolean,
+        vol.Optional(ATTR_SOURCE): cv.string,
+        vol.Optional(ATTR_GROUP): vol.Any(None, cv.entity_id),
+        vol.Optional(ATTR_SHUFFLE): cv.boolean,
+    }
+)
+
+BULK_SCHEMA = vol.Schema(
+    {vol.Required(ATTR_ZONES): vol.All(cv.ensure_list, [ZONE_TARGET_SCHEMA])}
+)
+
+PRESET_SCHEMA = vol.Schema({vol.Required(ATTR_NAME): cv.string})
+
+ANNOUNCE_SCHEMA = {
+    vol.Optional(ATTR_PRE_WAIT, default=0): vol.All(
+        vol.Coerce(float), vol.Range(min=0, max=5)
+    ),
+    vol.Optional(ATTR_POST_WAIT, default=0): vol.All(
+        vol.Coerce(float), vol.Range(min=0, max=5)
+    ),
+    vol.Optional(ATTR_VOLUME): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+    vol.Optional(ATTR_DURATION): vol.All(vol.Coerce(float), vol.Range(min=0)),
+}
+
+DOORBELL_SCHEMA = cv.make_entity_service_schema(
+    {
+        vol.Optional(ATTR_CHIME, default=DEFAULT_CHIME): cv.string,
+        **ANNOUNCE_SCHEMA,
+    }
+)
+
+TTS_SCHEMA = cv.make_entity_service_schema(
+    {
+        vol.Required(ATTR_INPUT): cv.string,
+        vol.Optional(ATTR_LANGUAGE_CODE): cv.string,
+        vol.Optional(ATTR_GENDER): cv.string,
+        vol.Optional(ATTR_VOICE): cv.string,
+        **ANNOUNCE_SCHEMA,
+    }
+)
+
+
+def resolve_zones(
+    hass: HomeAssistant, entity_ids: list[str], strict: bool = True
+) -> dict[str, tuple[CasaTunesDataUpdateCoordinator, str]]:
+    """Map CasaTunes media player entity_ids to their coordinator and zone_id.
+
+    Unless strict, entities that aren't CasaTunes zones are skipped, since
+    area and device targets reference every entity in them, and
+    ENTITY_MATCH_ALL selects every zone.
+    """
+    match_all = not strict and ENTITY_MATCH_ALL in entity_ids
+    zones = {}
+    for coordinator in hass.data[DOMAIN].values():
+        for entity in coordinator.entities:
+            if match_all or entity.entity_id in entity_ids:
+                zones[entity.entity_id] = (coordinator, entity.zone_id)
+
+    if strict and (
+        unknown := [entity_id for entity_id in entity_ids if entity_id not in zones]
+    ):
+        raise HomeAssistantError(f"Not CasaTunes zones: {', '.join(unknown)}")
+
+    return zones
+
+
+def zone_state(
+    coordinator: CasaTunesDataUpdateCoordinator, zone_id: str
+) -> dict[str, Any]:
+    """Return the restorable state of a zone from the last fetched data.
+
+    The group is stored as the zone_id of the group master, or None.
+    """
+    data = coordinator.data
+    zone = data.zones_dict[zone_id]
+    source = data.sources_dict.get(zone.SourceID)
+    nowplaying = data.nowplaying_dict.get(zone.SourceID)
+
+    return {
+        ATTR_POWER: bool(zone.Power),
+        ATTR_VOLUME: int(zone.Volume) if zone.Volume is not None else None,
+        ATTR_MUTE: bool(zone.Mute),
+        ATTR_SOURCE: source.Name if source is not None else None,
+        ATTR_GROUP: group_masters(data)[zone_id],
+        ATTR_SHUFFLE: bool(nowplaying.ShuffleMode) if nowplaying is not None else None,
+    }
+
+
+def zone_changes(saved: dict[str, Any], current: dict[str, Any]) -> dict[str, Any]:
+    """Return the attributes of a saved zone state that differ from the current one."""
+    return {
+        key: value
+        for key, value in saved.items()
+        if current.get(key) != value and (value is not None or key == ATTR_GROUP)
+    }
+
+
+def zone_command(
+    coordinator: CasaTunesDataUpdateCoordinator,
+    zone_id: str,
+    target: dict[str, Any],
+    master_id: str | None = None,
+):
+    """Return a command applying a zone target in a safe order.
+
+    The zone is powered on before anything else and powered off last, so
+    volume, source and group changes aren't lost on a zone that is off.
+    The group master is expected to be in master mode already, see
+    async_run_targets.
+    """
+    casatunes = coordinator.casatunes
+    data = coordinator.data
+    source_id = None
+    if (source := target.get(ATTR_SOURCE)) is not None:
+        source_id = source_id_for(coordinator, source)
+
+    async def command() -> None:
+        if target.get(ATTR_POWER) is True:
+            await casatunes.turn_on(zone_id)
+        if ATTR_GROUP in target:
+            if master_id is None:
+                zone = data.zones_dict.get(zone_id)
+                if zone is not None and zone.SharedRoomID and not zone.MasterMode:
+                    for master in data.zones:
+                        if (
+                            master.MasterMode
+                            and master.SharedRoomID == zone.SharedRoomID
+                        ):
+                            await casatunes.zone_unjoin(master.ZoneID, zone_id)
+            elif master_id != zone_id:
+                await casatunes.zone_join(master_id, zone_id)
+        if source_id is not None:
+            await casatunes.change_source(zone_id, source_id)
+        if ATTR_VOLUME in target:
+            await casatunes.set_volume_level(zone_id, target[ATTR_VOLUME])
+        if ATTR_MUTE in target:
+            await casatunes.mute_volume(zone_id, target[ATTR_MUTE])
+        if ATTR_SHUFFLE in target:
+            str_flag = "true" if target[ATTR_SHUFFLE] else "false"
+            await casatunes.player_action(
+                zone_id, "shuffle", f"ShuffleMode={str_flag}"
+            )
+        if target.get(ATTR_POWER) is False:
+            await casatunes.turn_off(zone_id)
+
+    return command
+
+
+def source_id_for(coordinator: CasaTunesDataUpdateCoordinator, source: str) -> str:
+    """Return the SourceID of a source name."""
+    for source_item in coordinator.data.sources:
+        if source_item.Name == source:
+            return source_item.SourceID
+    raise HomeAssistantError(f"Unknown source: {source}")
+
+
+async def async_run_targets(
+    coordinator: CasaTunesDataUpdateCoordinator,
+    targets: dict[str, tuple[dict[str, Any], str | None]],
+) -> dict[str, str | None]:
+    """Apply zone targets of one server, sharing calls that affect many zones.
+
+    Group masters are put in master mode once per master, and shuffle is set
+    once per source through a zone already playing it, before the per-zone
+    commands run. A zone whose shared call failed, or whose target names an
+    unknown source, reports that error.
+    """
+    casatunes = coordinator.casatunes
+    data = coordinator.data
+    shared: dict[str, list[Callable[[], Awaitable[None]]]] = defaultdict(list)
+    depends: dict[str, list[str]] = defaultdict(list)
+
+    for zone_id, (_, master_id) in targets.items():
+        if master_id is not None and master_id != zone_id:
+            if master_id not in depends:
+                shared[master_id].append(
+                    partial(casatunes.zone_master, master_id, True)
+                )
+            depends[master_id].append(zone_id)
+
+    targets = dict(targets)
+    shuffles: dict[tuple[Any, bool], list[str]] = defaultdict(list)
+    for zone_id, (target, master_id) in targets.items():
+        if ATTR_SHUFFLE not in target:
+            continue
+        # A zone joining a group plays the source of its master.
+        source_zone = zone_id if master_id is None else master_id
+        source_target = targets.get(source_zone, ({}, None))[0]
+        if (source := source_target.get(ATTR_SOURCE)) is not None:
+            try:
+                source_id = source_id_for(coordinator, source)
+            except HomeAssistantError:
+                # Reported by the zone command of the zone switching source.
+                continue
+        elif (zone := data.zones_dict.get(source_zone)) is not None:
+            source_id = zone.SourceID
+        else:
+            continue
+        shuffles[(source_id, target[ATTR_SHUFFLE])].append(zone_id)
+
+    # Zones switching source or group won't be on their current source.
+    moving = {
+        zone_id
+        for zone_id, (target, _) in targets.items()
+        if ATTR_SOURCE in target or ATTR_GROUP in target
+    }
+    for (source_id, shuffle), zone_ids in shuffles.items():
+        playing = next(
+            (
+                zone.ZoneID
+                for zone in data.zones
+                if zone.SourceID == source_id and zone.ZoneID not in moving
+            ),
+            None,
+        )
+        if playing is not None:
+            str_flag = "true" if shuffle else "false"
+            shared[playing].append(
+                partial(
+                    casatunes.player_action,
+                    playing,
+                    "shuffle",
+                    f"ShuffleMode={str_flag}",
+                )
+            )
+            depends[playing].extend(zone_ids)
+            keep = None
+        else:
+            # No zone is on the source yet, so the first zone switching to it
+            # sets shuffle after its source change.
+            keep = zone_ids[0]
+        for zone_id in zone_ids:
+            if zone_id != keep:
+                target, master_id = targets[zone_id]
+                target = {
+                    key: value for key, value in target.items() if key != ATTR_SHUFFLE
+                }
+                targets[zone_id] = (target, master_id)
+
+    def run_all(calls: list[Callable[[], Awaitable[None]]]):
+        async def command() -> None:
+            for call in calls:
+                await call()
+
+        return command
+
+    errors: dict[str, str | None] = {}
+    if shared:
+        shared_errors = await coordinator.async_run_zone_commands(
+            {zone_id: run_all(calls) for zone_id, calls in shared.items()},
+            refresh=False,
+        )
+        for zone_id, error in shared_errors.items():
+            if error is not None:
+                for dependent in depends[zone_id]:
+                    errors.setdefault(dependent, error)
+
+    # A zone whose target can't be applied, like a renamed or hidden source,
+    # reports it without holding up the other zones.
+    commands = {}
+    for zone_id, (target, master_id) in targets.items():
+        try:
+            commands[zone_id] = zone_command(coordinator, zone_id, target, master_id)
+        except HomeAssistantError as err:
+            errors[zone_id] = str(err)
+
+    zone_errors = await coordinator.async_run_zone_commands(commands)
+    return {
+        zone_id: zone_errors.get(zone_id) or errors.get(zone_id) for zone_id in targets
+    }
+
+
+async def async_bulk(hass: HomeAssistant, call: ServiceCall) -> dict[str, Any]:
+    """Apply targets to many zones with one round of concurrent calls."""
+    targets = call.data[ATTR_ZONES]
+    zones = resolve_zones(
+        hass,
+        [target[ATTR_ENTITY_ID] for target in targets]
+        + [target[ATTR_GROUP] for target in targets if target.get(ATTR_GROUP)],
+    )
+
+    batches: dict[
+        CasaTunesDataUpdateCoordinator, dict[str, tuple[dict[str, Any], str | None]]
+    ] = defaultdict(dict)
+    entity_ids: dict[tuple[CasaTunesDataUpdateCoordinator, str], str] = {}
+    grouping = False
+    for target in targets:
+        coordinator, zone_id = zones[target[ATTR_ENTITY_ID]]
+        master_id = None
+        if target.get(ATTR_GROUP):
+            master_coordinator, master_id = zones[target[ATTR_GROUP]]
+            if master_coordinator is not coordinator:
+                raise HomeAssistantError(
+                    f"{target[ATTR_ENTITY_ID]} can't join a zone on another server"
+                )
+        grouping |= ATTR_GROUP in target
+        batches[coordinator][zone_id] = (target, master_id)
+        entity_ids[(coordinator, zone_id)] = target[ATTR_ENTITY_ID]
+
+    async def run(coordinator: CasaTunesDataUpdateCoordinator, targets):
+        errors = await async_run_targets(coordinator, targets)
+        if grouping:
+            await coordinator.async_sync_masters()
+        return coordinator, errors
+
+    results: dict[str, Any] = {}
+    for coordinator, errors in await asyncio.gather(
+        *(run(coordinator, targets) for coordinator, targets in batches.items())
+    ):
+        for zone_id, error in errors.items():
+            results[entity_ids[(coordinator, zone_id)]] = {
+                "success": error is None,
+                "error": error,
+            }
+
+    return {ATTR_ZONES: results}
+
+
+async def async_restore(
+    coordinator: CasaTunesDataUpdateCoordinator, saved: dict[str, dict[str, Any]]
+) -> dict[str, str | None]:
+    """Restore saved zone states, only sending commands for what differs."""
+    targets = {}
+    for zone_id, state in saved.items():
+        if zone_id not in coordinator.data.zones_dict:
+            continue
+        changes = zone_changes(state, zone_state(coordinator, zone_id))
+        if changes:
+            targets[zone_id] = (changes, changes.get(ATTR_GROUP))
+
+    _LOGGER.debug("Restoring %s of %s zones", len(targets), len(saved))
+    if not targets:
+        return {}
+
+    errors = await async_run_targets(coordinator, targets)
+    if ATTR_GROUP in (key for state in saved.values() for key in state):
+        await coordinator.async_sync_masters()
+    return errors
+
+
+async def async_announce(hass: HomeAssistant, call: ServiceCall) -> dict[str, Any]:
+    """Play a doorbell chime or TTS message and restore the zones afterwards.
+
+    Zone state is taken from the coordinator data so the announcement isn't
+    delayed by a fetch. The announcement is sent to all zones concurrently,
+    held for its duration, and then only the zones and attributes that no
+    longer match the snapshot are restored, again concurrently. Overlapping
+    announcements in a zone keep the first snapshot, and only the last one
+    to finish restores it.
+    """
+    started = time.monotonic()
+    zones = resolve_zones(
+        hass, list(await async_extract_entity_ids(hass, call)), strict=False
+    )
+
+    if call.service == SERVICE_DOORBELL:
+        query = {ATTR_CHIME: call.data[ATTR_CHIME]}
+        duration = DEFAULT_CHIME_DURATION
+    else:
+        query = {
+            ATTR_INPUT: call.data[ATTR_INPUT],
+            "language": call.data.get(ATTR_LANGUAGE_CODE, ""),
+            ATTR_GENDER: call.data.get(ATTR_GENDER, ""),
+        }
+        if ATTR_VOICE in call.data:
+            query[ATTR_VOICE] = call.data[ATTR_VOICE]
+        duration = (
+            TTS_RENDER_TIME + len(call.data[ATTR_INPUT].split()) / TTS_WORDS_PER_SECOND
+        )
+    query[ATTR_PRE_WAIT] = call.data[ATTR_PRE_WAIT]
+    query[ATTR_POST_WAIT] = call.data[ATTR_POST_WAIT]
+    query[ATTR_VOLUME] = call.data.get(ATTR_VOLUME, "")
+    duration = call.data.get(ATTR_DURATION, duration)
+    hold = duration + call.data[ATTR_PRE_WAIT] + call.data[ATTR_POST_WAIT]
+
+    batches: dict[CasaTunesDataUpdateCoordinator, list[str]] = defaultdict(list)
+    for coordinator, zone_id in zones.values():
+        batches[coordinator].append(zone_id)
+
+    async def run(coordinator: CasaTunesDataUpdateCoordinator, zone_ids: list[str]):
+        casatunes = coordinator.casatunes
+        play = (
+            casatunes.doorbell if call.service == SERVICE_DOORBELL else casatunes.tts
+        )
+        announcing = coordinator.announcing
+
+        def command(zone_id: str):
+            return lambda: play(zone_id, query)
+
+        # Only the snapshot and sending are serialized. A zone that is already
+        # announcing keeps its earliest snapshot, and the last announcement
+        # to finish in it restores it.
+        registered: list[str] = []
+        try:
+            async with coordinator.announce_lock:
+                for zone_id in zone_ids:
+                    if zone_id in announcing:
+                        announcing[zone_id][1] += 1
+                    else:
+                        announcing[zone_id] = [zone_state(coordinator, zone_id), 1]
+                    registered.append(zone_id)
+                errors = await coordinator.async_run_zone_commands(
+                    {zone_id: command(zone_id) for zone_id in zone_ids}, refresh=False
+                )
+            latency = time.monotonic() - started
+
+            await asyncio.sleep(hold)
+        finally:
+            saved = {}
+            for zone_id in registered:
+                announcing[zone_id][1] -= 1
+                if not announcing[zone_id][1]:
+                    saved[zone_id] = announcing.pop(zone_id)[0]
+
+        restore_started = time.monotonic()
+        restore_errors = {}
+        if saved:
+            await coordinator.async_refresh()
+            restore_errors = await async_restore(coordinator, saved)
+        restore_time = time.monotonic() - restore_started
+
+        _LOGGER.debug(
+            "Announced in %s zones after %.3fs, restored in %.3fs",
+            len(zone_ids),
+            latency,
+            restore_time,
+        )
+        return coordinator, errors, restore_errors, latency, restore_time
+
+    results: dict[str, Any] = {}
+    latency = restore_time = 0.0
+    for coordinator, errors, restore_errors, batch_latency, batch_restore in (
+        await asyncio.gather(
+            *(run(coordinator, zone_ids) for coordinator, zone_ids in batches.items())
+        )
+    ):
+        latency = max(latency, batch_latency)
+        restore_time = max(restore_time, batch_restore)
+        for entity_id, (zone_coordinator, zone_id) in zones.items():
+            if zone_coordinator is coordinator:
+                error = errors.get(zone_id) or restore_errors.get(zone_id)
+                results[entity_id] = {"success": error is None, "error": error}
+
+    return {ATTR_ZONES: results, "latency": latency, "restore_time": restore_time}
+
+
+async def async_save_preset(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Save the current state of every zone as a preset."""
+    for coordinator in hass.data[DOMAIN].values():
+        await coordinator.presets.async_save(
+            call.data[ATTR_NAME],
+            {
+                zone.ZoneID: zone_state(coordinator, zone.ZoneID)
+                for zone in coordinator.data.zones
+            },
+        )
+
+
+async def async_restore_preset(
+    hass: HomeAssistant, call: ServiceCall
+) -> dict[str, Any]:
+    """Restore a preset, sending commands only for what differs."""
+    name = call.data[ATTR_NAME]
+    coordinators = [
+        coordinator
+        for coordinator in hass.data[DOMAIN].values()
+        if coordinator.presets.get(name) is not None
+    ]
+    if not coordinators:
+        raise HomeAssistantError(f"Unknown preset: {name}")
+
+    all_errors = await asyncio.gather(
+        *(
+            async_restore(coordinator, coordinator.presets.get(name))
+            for coordinator in coordinators
+        )
+    )
+
+    results: dict[str, Any] = {}
+    for coordinator, errors in zip(coordinators, all_errors):
+        for entity in coordinator.entities:
+            if entity.zone_id in errors:
+                error = errors[entity.zone_id]
+                results[entity.entity_id] = {"success": error is None, "error": error}
+
+    return {ATTR_ZONES: results}
+
+
+async def async_delete_preset(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Delete a preset."""
+    for coordinator in hass.data[DOMAIN].values():
+        await coordinator.presets.async_delete(call.data[ATTR_NAME])
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the CasaTunes integration services."""
+    if hass.services.has_service(DOMAIN, SERVICE_BULK):
+        return
+
+    async def async_handle_bulk(call: ServiceCall):
+        """Handle the bulk service."""
+        return await async_bulk(hass, call)
+
+    async def async_handle_announce(call: ServiceCall):
+        """Handle the doorbell and TTS services."""
+        return await async_announce(hass, call)
+
+    async def async_handle_save_preset(call: ServiceCall) -> None:
+        """Handle the save preset service."""
+        await async_save_preset(hass, call)
+
+    async def async_handle_restore_preset(call: ServiceCall):
+        """Handle the restore preset service."""
+        return await async_restore_preset(hass, call)
+
+    async def async_handle_delete_preset(call: ServiceCall) -> None:
+        """Handle the delete preset service."""
+        await async_delete_preset(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BULK,
+        async_handle_bulk,
+        BULK_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_DOORBELL,
+        async_handle_announce,
+        DOORBELL_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_TTS,
+        async_handle_announce,
+        TTS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_SAVE_PRESET, async_handle_save_preset, PRESET_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RESTORE_PRESET,
+        async_handle_restore_preset,
+        PRESET_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_DELETE_PRESET, async_handle_delete_preset, PRESET_SCHEMA
+    )
@@ -0,0 +1,225 @@
+"""Immutable state snapshots for the CasaTunes integration."""
+from __future__ import annotations
+
+import sys
+from types import MappingProxyType
+from typing import Any
+
+from pycasatunes import CasaTunes
+
+
+def _intern(value: Any) -> Any:
+    """Intern strings so repeated names and IDs share one object."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Record:
+    """Base for compact, immutable state records."""
+
+    __slots__: tuple[str, ...] = ()
+
+    def __init__(self, *values: Any) -> None:
+        """Initialize from values in slot order."""
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, _intern(value))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Refuse to modify the record."""
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other: object) -> bool:
+        """Compare records by value."""
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __hash__(self) -> int:
+        """Hash records by value."""
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self) -> str:
+        """Return the representation."""
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class SystemRecord(Record):
+    """CasaTunes system information."""
+
+    __slots__ = ("MACAddress", "AppName", "CasaTunesVersion")
+
+
+class ZoneRecord(Record):
+    """State of a CasaTunes zone."""
+
+    __slots__ = (
+        "ZoneID",
+        "Name",
+        "GroupName",
+        "Power",
+        "Volume",
+        "Mute",
+        "SourceID",
+        "SharedRoomID",
+        "MasterMode",
+    )
+
+
+class SourceRecord(Record):
+    """A CasaTunes source."""
+
+    __slots__ = ("SourceID", "Name", "Hidden")
+
+
+class SongRecord(Record):
+    """The song playing on a source."""
+
+    __slots__ = ("ID", "Title", "Artists", "Album", "ArtworkURI", "Duration")
+
+
+class NowPlayingRecord(Record):
+    """Playback state of a CasaTunes source."""
+
+    __slots__ = (
+        "SourceID",
+        "Status",
+        "ShuffleMode",
+        "QueueSongIndex",
+        "QueueCount",
+        "ChangeQueueID",
+        "CurrProgress",
+        "CurrSong",
+    )
+
+
+class CasaTunesSnapshot:
+    """Consistent, immutable view of a CasaTunes system after one fetch."""
+
+    __slots__ = (
+        "system",
+        "zones",
+        "zones_dict",
+        "sources",
+        "sources_dict",
+        "nowplaying",
+        "nowplaying_dict",
+    )
+
+    def __init__(
+        self,
+        system: SystemRecord,
+        zones: tuple[ZoneRecord, ...],
+        sources: tuple[SourceRecord, ...],
+        nowplaying: tuple[NowPlayingRecord, ...],
+    ) -> None:
+        """Initialize."""
+        set_value = object.__setattr__
+        set_value(self, "system", system)
+        set_value(self, "zones", zones)
+        set_value(
+            self, "zones_dict", MappingProxyType({zone.ZoneID: zone for zone in zones})
+        )
+        set_value(self, "sources", sources)
+        set_value(
+            self,
+            "sources_dict",
+            MappingProxyType({source.SourceID: source for source in sources}),
+        )
+        set_value(self, "nowplaying", nowplaying)
+        set_value(
+            self,
+            "nowplaying_dict",
+            MappingProxyType({item.SourceID: item for item in nowplaying}),
+        )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Refuse to modify the snapshot."""
+        raise AttributeError("CasaTunesSnapshot is immutable")
+
+
+def group_masters(snapshot: CasaTunesSnapshot) -> dict[str, str | None]:
+    """Return the zone_id of each zone's group master, or None if ungrouped."""
+    masters = {
+        zone.SharedRoomID: zone.ZoneID
+        for zone in snapshot.zones
+        if zone.MasterMode and zone.SharedRoomID
+    }
+    return {
+        zone.ZoneID: masters.get(zone.SharedRoomID) if zone.SharedRoomID else None
+        for zone in snapshot.zones
+    }
+
+
+def _share(record: Record, previous: Record | None) -> Record:
+    """Return the previous record if unchanged, so snapshots share it."""
+    return previous if record == previous else record
+
+
+def build_snapshot(
+    casatunes: CasaTunes, previous: CasaTunesSnapshot | None = None
+) -> CasaTunesSnapshot:
+    """Build a snapshot from fetched data, reusing unchanged records."""
+    system = casatunes.system
+    system_record = SystemRecord(
+        system.MACAddress, system.AppName, system.CasaTunesVersion
+    )
+
+    zones = []
+    for zone in casatunes.zones:
+        record = ZoneRecord(
+            zone.ZoneID,
+            zone.Name,
+            zone.GroupName,
+            zone.Power,
+            zone.Volume,
+            zone.Mute,
+            zone.SourceID,
+            zone.SharedRoomID,
+            zone.MasterMode,
+        )
+        zones.append(
+            _share(record, previous and previous.zones_dict.get(zone.ZoneID))
+        )
+
+    sources = []
+    for source in casatunes.sources:
+        record = SourceRecord(source.SourceID, source.Name, source.Hidden)
+        sources.append(
+            _share(record, previous and previous.sources_dict.get(source.SourceID))
+        )
+
+    nowplaying = []
+    for item in casatunes.nowplaying:
+        previous_item = previous and previous.nowplaying_dict.get(item.SourceID)
+        song = item.CurrSong
+        song_record = _share(
+            SongRecord(
+                song.ID,
+                song.Title,
+                song.Artists,
+                song.Album,
+                song.ArtworkURI,
+                song.Duration,
+            ),
+            previous_item and previous_item.CurrSong,
+        )
+        record = NowPlayingRecord(
+            item.SourceID,
+            item.Status,
+            item.ShuffleMode,
+            item.QueueSongIndex,
+            item.QueueCount,
+            item.ChangeQueueID,
+            item.CurrProgress,
+            song_record,
+        )
+        nowplaying.append(_share(record, previous_item))
+
+    return CasaTunesSnapshot(
+        _share(system_record, previous and previous.system),
+        tuple(zones),
+        tuple(sources),
+        tuple(nowplaying),
+    )
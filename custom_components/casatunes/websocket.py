@@ -0,0 +1,93 @@
+"""Websocket API for the CasaTunes integration."""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import DOMAIN, PROGRESS_INTERVAL
+
+if TYPE_CHECKING:
+    from .media_player import CasaTunesMediaPlayer
+
+
+@callback
+def async_setup_websocket(hass: HomeAssistant) -> None:
+    """Register the CasaTunes websocket commands."""
+    websocket_api.async_register_command(hass, websocket_subscribe_progress)
+
+
+def find_entity(hass: HomeAssistant, entity_id: str) -> CasaTunesMediaPlayer | None:
+    """Return the CasaTunes media player entity with an entity_id, if loaded."""
+    for coordinator in hass.data.get(DOMAIN, {}).values():
+        for entity in coordinator.entities:
+            if entity.entity_id == entity_id:
+                return entity
+    return None
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/subscribe_progress",
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+    }
+)
+@callback
+def websocket_subscribe_progress(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: dict[str, Any],
+) -> None:
+    """Stream the interpolated playback progress of a zone.
+
+    Progress is computed from the last reported position, so subscribers get
+    a live position without the entity writing state. Messages are only sent
+    when the progress changed since the last one, and the subscription ends
+    with an error once the entity is removed.
+    """
+    if find_entity(hass, msg[ATTR_ENTITY_ID]) is None:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_FOUND, "Entity not found"
+        )
+        return
+
+    last: dict[str, Any] = {}
+
+    @callback
+    def send_progress(*_: Any) -> None:
+        """Send the progress if it changed."""
+        # Looked up on every tick, since reloading the entry replaces entities.
+        if (entity := find_entity(hass, msg[ATTR_ENTITY_ID])) is None:
+            unsubscribe = connection.subscriptions.pop(msg["id"], None)
+            if unsubscribe is not None:
+                unsubscribe()
+            connection.send_error(
+                msg["id"], websocket_api.ERR_NOT_FOUND, "Entity removed"
+            )
+            return
+
+        position = entity.interpolated_media_position()
+        progress = {
+            "state": entity.state,
+            "position": round(position, 1) if position is not None else None,
+            "duration": entity.media_duration,
+            "title": entity.media_title,
+        }
+        if progress == last:
+            return
+        last.clear()
+        last.update(progress)
+        connection.send_message(websocket_api.event_message(msg["id"], progress))
+
+    connection.subscriptions[msg["id"]] = async_track_time_interval(
+        hass, send_progress, timedelta(seconds=PROGRESS_INTERVAL)
+    )
+    connection.send_result(msg["id"])
+    send_progress()